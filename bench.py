@@ -0,0 +1,668 @@
+"""Micro-benchmarks for the hot paths in map.py.
+
+Usage (from the repo root):
+    python bench.py spatial [--sizes 1000,10000,100000] [--repeat 50]
+    python bench.py zillow [--clients 8] [--requests 25] [--interval 0.005]
+    python bench.py listings [--count 20000]
+    python bench.py ttfm [--runs 10] [--latency 0.3]
+    python bench.py clusters [--cached 100000] [--zoom 10]
+    python bench.py delta [--cached 100000] [--pans 40]
+    python bench.py wire [--cached 20000]
+    python bench.py prefetch [--pans 12] [--think 2.0]
+    python bench.py comps [--cached 2000] [--subjects 50]
+    python bench.py startup [--sizes 0,10000,100000]
+    python bench.py lookup [--cached 100000]
+    python bench.py quota [--rounds 20]
+
+The app module is imported from inside a scratch directory, so the benchmarks
+never touch the real property cache, logs, report cache or user files.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Tampa, FL and a typical zoom-14 viewport around it
+CENTER = (27.9506, -82.4572)
+VIEWPORT = (27.93, -82.49, 27.97, -82.43)
+
+
+def load_app():
+    work = tempfile.mkdtemp(prefix="reintel-bench-")
+    os.chdir(work)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    app = importlib.import_module("map")
+    app.logger.setLevel(logging.WARNING)
+    app.PREFETCH_ENABLED = False  # only the prefetch benchmark turns it back on
+    app._prop_hydrated.wait()  # benchmarks seed the cache themselves
+    return app
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return result, samples
+
+
+def _pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _fake_payload(i, rnd):
+    lat = CENTER[0] + rnd.uniform(-0.75, 0.75)
+    lon = CENTER[1] + rnd.uniform(-0.75, 0.75)
+    return {
+        "zpid": str(10_000_000 + i), "latitude": lat, "longitude": lon,
+        "address": f"{i} Bench St, Tampa, FL 33602", "price": rnd.randint(150_000, 900_000),
+        "bedrooms": rnd.randint(1, 5), "bathrooms": rnd.randint(1, 4),
+        "imgSrc": f"https://photos.example.com/{i}.jpg", "detailUrl": f"/homedetails/{i}_zpid/",
+        "lastSoldPrice": rnd.randint(100_000, 700_000), "livingArea": rnd.randint(700, 4000),
+        "lotAreaValue": rnd.randint(2000, 20000), "lotAreaUnit": "sqft", "propertyType": "SINGLE_FAMILY",
+        "listingStatus": "FOR_SALE", "daysOnZillow": rnd.randint(0, 200), "country": "USA", "currency": "USD",
+        "zestimate": rnd.randint(150_000, 900_000), "rentZestimate": rnd.randint(1200, 6000),
+        "hasImage": True, "has3DModel": False, "hasVideo": False,
+        "listingSubType": {"is_FSBA": True}, "carouselPhotos": [{"url": f"https://photos.example.com/{i}-{k}.jpg"} for k in range(4)],
+    }
+
+
+def _seed_properties(app, n, seed=7):
+    rnd = random.Random(seed)
+    now = app._now()
+    bucket = app._cache["property_by_zpid"]
+    bucket.max_entries = max(bucket.max_entries, n)
+    bucket.clear()
+    for i in range(n):
+        p = _fake_payload(i, rnd)
+        bucket.set(p["zpid"], {"ts": now, "listing": app.Listing.from_payload(p["zpid"], p)})
+    app._grid_rebuild()
+
+
+def _legacy_scan(app, sw_lat, sw_lng, ne_lat, ne_lng):
+    # the pre-index cache-first preload: walk every cached property
+    out = []
+    for _z, entry in app._cache["property_by_zpid"].items():
+        listing = entry["listing"]
+        if listing.lat is None:
+            continue
+        if sw_lat <= listing.lat <= ne_lat and sw_lng <= listing.lon <= ne_lng:
+            out.append(entry)
+    return out
+
+
+def bench_spatial(app, sizes, repeat):
+    print(f"{'cache_size':>10} {'in_view':>8} {'grid_p50_ms':>12} {'grid_p95_ms':>12} {'scan_p50_ms':>12} {'scan_p95_ms':>12}")
+    for n in sizes:
+        _seed_properties(app, n)
+        homes, grid = _timed(lambda: app._cached_homes_in_bounds(*VIEWPORT), repeat)
+        _, scan = _timed(lambda: _legacy_scan(app, *VIEWPORT), max(3, repeat // 5))
+        print(f"{n:>10} {len(homes):>8} {statistics.median(grid):>12.3f} {_pct(grid, .95):>12.3f} "
+              f"{statistics.median(scan):>12.3f} {_pct(scan, .95):>12.3f}")
+
+
+def _legacy_card(app, p):
+    # how cards were built before listings were normalized at store time
+    prop = p.get("property") or {}
+    last = p.get("lastSoldPrice") or prop.get("lastSoldPrice") or "N/A"
+    try:
+        if last not in (None, "N/A"):
+            last = f"${int(float(str(last).replace('$','').replace(',',''))):,}"
+    except Exception:
+        last = str(last)
+    return {
+        "lat": p.get("latitude"), "lon": p.get("longitude"),
+        "address": app.address_to_string(p.get("address") or p.get("streetAddress") or prop.get("address") or ""),
+        "price": p.get("price") or p.get("priceRaw") or "",
+        "bedrooms": p.get("bedrooms") or prop.get("bedrooms") or "",
+        "bathrooms": p.get("bathrooms") or prop.get("bathrooms") or "",
+        "img_url": p.get("imgSrc") or p.get("img_url") or prop.get("imgSrc") or "",
+        "detail_url": p.get("detailUrl") or p.get("detail_url") or prop.get("url") or "",
+        "last_sold_amount": last,
+    }
+
+
+def _resident_bytes(build):
+    tracemalloc.start()
+    base = tracemalloc.take_snapshot()
+    held = build()
+    size = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(base, "filename"))
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def bench_listings(app, count, repeat):
+    """Per-refresh card building and resident size: raw payload dicts vs. normalized Listings."""
+    rnd = random.Random(11)
+    payloads = [_fake_payload(i, rnd) for i in range(count)]
+    listings = [app.Listing.from_payload(p["zpid"], p) for p in payloads]
+    _, raw = _timed(lambda: [_legacy_card(app, p) for p in payloads], repeat)
+    _, norm = _timed(lambda: [l.to_card() for l in listings], repeat)
+    raw_bytes = _resident_bytes(lambda: [json.loads(json.dumps(p)) for p in payloads])
+    norm_bytes = _resident_bytes(lambda: [app.Listing.from_payload(p["zpid"], json.loads(json.dumps(p))) for p in payloads])
+    print(f"{'kind':>8} {'count':>7} {'cards_p50_ms':>13} {'cards_p95_ms':>13} {'resident_MB':>12}")
+    print(f"{'raw':>8} {count:>7} {statistics.median(raw):>13.2f} {_pct(raw, .95):>13.2f} {raw_bytes / 1e6:>12.1f}")
+    print(f"{'listing':>8} {count:>7} {statistics.median(norm):>13.2f} {_pct(norm, .95):>13.2f} {norm_bytes / 1e6:>12.1f}")
+
+
+class _StubZillow(BaseHTTPRequestHandler):
+    """Minimal keep-alive stand-in for the RapidAPI Zillow endpoints."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    connections = 0
+    requests = 0
+    latency = 0.0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _StubZillow._lock:
+            _StubZillow.connections += 1
+
+    def do_GET(self):
+        with _StubZillow._lock:
+            _StubZillow.requests += 1
+        if _StubZillow.latency:
+            time.sleep(_StubZillow.latency)
+        rnd = random.Random(self.path)
+        body = json.dumps({"props": [_fake_payload(rnd.randint(0, 10**7), rnd) for _ in range(200)]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+def start_stub_zillow(app, latency=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubZillow)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _StubZillow.latency = latency
+    app.RAPIDAPI_HOST = f"127.0.0.1:{server.server_address[1]}"
+    app.RAPIDAPI_HTTPS = False
+    return server
+
+
+def bench_zillow(app, clients, per_client, interval, latency, pool_sizes):
+    """Concurrent /refresh load against the stub; every refresh misses props_by_location."""
+    start_stub_zillow(app, latency)
+    app.ZILLOW_MIN_INTERVAL = interval
+    counter = iter(range(10**9))
+    app.reverse_geocode = lambda lat, lon: f"bench-{next(counter)}"
+    print(f"{'pool':>4} {'refreshes':>9} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'upstream':>8} {'conns':>6}")
+    for pool in pool_sizes:
+        app.ZILLOW_POOL_SIZE = max(1, pool)
+        app._zillow_ensure_workers()
+        app.ZILLOW_POOL_SIZE = pool  # 0 => never park a connection, i.e. one TLS/TCP setup per call
+        _StubZillow.connections = _StubZillow.requests = 0
+        latencies, lock = [], threading.Lock()
+
+        def worker(cid):
+            client = app.app.test_client()
+            for i in range(per_client):
+                lat, lon = CENTER[0] + cid * 0.1, CENTER[1] + i * 0.1
+                body = {"sw_lat": lat - .02, "sw_lng": lon - .03, "ne_lat": lat + .02, "ne_lng": lon + .03,
+                        "center_lat": lat, "center_lng": lon, "zoom": 14}
+                t0 = time.perf_counter()
+                client.post("/refresh", json=body)
+                with lock:
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(c,)) for c in range(clients)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        wall = time.perf_counter() - t0
+        print(f"{pool:>4} {len(latencies):>9} {len(latencies) / wall:>8.1f} {statistics.median(latencies):>8.1f} "
+              f"{_pct(latencies, .95):>8.1f} {_StubZillow.requests:>8} {_StubZillow.connections:>6}")
+
+
+def bench_ttfm(app, runs, latency, cached):
+    """Time to the first marker batch: buffered JSON /refresh vs. the NDJSON stream.
+
+    Each run pans to a fresh location (so props_by_location misses and Zillow is
+    called) inside an area that already has `cached` properties in the store.
+    """
+    start_stub_zillow(app, latency)
+    app.MIN_REFRESH_INTERVAL = 0
+    _seed_properties(app, cached)
+    counter = iter(range(10**9))
+    app.reverse_geocode = lambda lat, lon: f"ttfm-{next(counter)}"
+    client = app.app.test_client()
+    body = {"sw_lat": VIEWPORT[0], "sw_lng": VIEWPORT[1], "ne_lat": VIEWPORT[2], "ne_lng": VIEWPORT[3],
+            "center_lat": CENTER[0], "center_lng": CENTER[1], "zoom": 14}
+    buffered, first, done = [], [], []
+    for i in range(runs):
+        body["center_lat"] = CENTER[0] + (i % 2) * 0.02  # defeat the small-move debounce
+        t0 = time.perf_counter()
+        client.post("/refresh", json=body)
+        buffered.append((time.perf_counter() - t0) * 1000.0)
+
+        body["center_lat"] = CENTER[0] + ((i + 1) % 2) * 0.02
+        t0 = time.perf_counter()
+        resp = client.post("/refresh?stream=1", json=body, buffered=False)
+        t_first = None
+        for chunk in resp.response:
+            if t_first is None and b'"homes"' in chunk:
+                t_first = (time.perf_counter() - t0) * 1000.0
+        resp.close()
+        done.append((time.perf_counter() - t0) * 1000.0)
+        first.append(t_first if t_first is not None else done[-1])
+    print(f"{'mode':>9} {'runs':>5} {'first_p50_ms':>13} {'first_p95_ms':>13} {'done_p50_ms':>12}")
+    print(f"{'json':>9} {runs:>5} {statistics.median(buffered):>13.1f} {_pct(buffered, .95):>13.1f} {statistics.median(buffered):>12.1f}")
+    print(f"{'ndjson':>9} {runs:>5} {statistics.median(first):>13.1f} {_pct(first, .95):>13.1f} {statistics.median(done):>12.1f}")
+
+
+def bench_clusters(app, cached, zoom, repeat):
+    """Low-zoom /refresh: every cached home as a card vs. server-side clusters."""
+    _seed_properties(app, cached)
+    app.MIN_REFRESH_INTERVAL = 0
+    app._location_homes = lambda *a, **k: []  # only the cache is measured here
+    app.reverse_geocode = lambda lat, lon: "bench"
+    client = app.app.test_client()
+    body = {"sw_lat": CENTER[0] - .8, "sw_lng": CENTER[1] - .8, "ne_lat": CENTER[0] + .8, "ne_lng": CENTER[1] + .8,
+            "center_lat": CENTER[0], "center_lng": CENTER[1], "zoom": zoom}
+    print(f"{'mode':>9} {'items':>7} {'bytes':>10} {'p50_ms':>8} {'p95_ms':>8}")
+    default_max = app.CLUSTER_MAX_ZOOM
+    for mode, max_zoom in (("homes", -1), ("clusters", default_max)):
+        app.CLUSTER_MAX_ZOOM = max_zoom
+        sizes = []
+        def call():
+            body["center_lat"] = CENTER[0] + (len(sizes) % 2) * 0.05  # defeat the small-move debounce
+            resp = client.post("/refresh", json=body)
+            sizes.append(len(resp.data))
+            return resp.get_json()
+        call()  # warm-up: the first call also frees the previous mode's results
+        items, samples = _timed(call, repeat)
+        print(f"{mode:>9} {len(items):>7} {sizes[-1]:>10} {statistics.median(samples):>8.1f} {_pct(samples, .95):>8.1f}")
+    app.CLUSTER_MAX_ZOOM = default_max
+
+
+def bench_delta(app, cached, pans, step):
+    """Small pans at zoom 14: full /refresh arrays vs. the delta protocol.
+
+    markers_touched is the client-side render work per pan: the full protocol
+    clears and re-adds every marker, the delta one only adds/replaces/removes.
+    """
+    _seed_properties(app, cached)
+    app.MIN_REFRESH_INTERVAL = 0
+    app._location_homes = lambda *a, **k: []  # only the cache is measured here
+    app.reverse_geocode = lambda lat, lon: "bench"
+    h, w = VIEWPORT[2] - VIEWPORT[0], VIEWPORT[3] - VIEWPORT[1]
+    print(f"{'mode':>6} {'pans':>5} {'avg_bytes':>10} {'p50_ms':>8} {'p95_ms':>8} {'touched/pan':>12} {'304s':>5}")
+    for mode in ("full", "delta"):
+        client = app.app.test_client()
+        etag, known, prev = None, set(), 0
+        sizes, times, touched, not_modified = [], [], [], 0
+        for i in range(pans):
+            lat = CENTER[0] + (i // 2) * step * h  # every other pan repeats the viewport
+            lon = CENTER[1] + (i // 2) * step * w
+            body = {"sw_lat": lat - h / 2, "sw_lng": lon - w / 2, "ne_lat": lat + h / 2, "ne_lng": lon + w / 2,
+                    "center_lat": lat, "center_lng": lon + (i % 2) * 0.02, "zoom": 14}
+            if mode == "delta":
+                body.update(delta=True, etag=etag, known=sorted(known))
+            t0 = time.perf_counter()
+            resp = client.post("/refresh", json=body)
+            times.append((time.perf_counter() - t0) * 1000.0)
+            sizes.append(len(resp.data))
+            if mode == "full":
+                homes = resp.get_json()
+                touched.append(prev + len(homes)); prev = len(homes)
+            elif resp.status_code == 304:
+                not_modified += 1; touched.append(0)
+            else:
+                d = resp.get_json()
+                etag = d["etag"]
+                known = (known - set(d["removed"])) | {x["id"] for x in d["added"] + d["changed"]}
+                touched.append(len(d["added"]) + 2 * len(d["changed"]) + len(d["removed"]))
+        print(f"{mode:>6} {pans:>5} {statistics.mean(sizes):>10.0f} {statistics.median(times):>8.1f} "
+              f"{_pct(times, .95):>8.1f} {statistics.mean(touched):>12.1f} {not_modified:>5}")
+
+
+def bench_wire(app, cached):
+    """Bytes on the wire for one large-viewport /refresh: JSON vs. columnar, identity/gzip/br."""
+    _seed_properties(app, cached)
+    app.MIN_REFRESH_INTERVAL = 0
+    app._location_homes = lambda *a, **k: []
+    app.reverse_geocode = lambda lat, lon: "bench"
+    client = app.app.test_client()
+    body = {"sw_lat": CENTER[0] - .25, "sw_lng": CENTER[1] - .25, "ne_lat": CENTER[0] + .25, "ne_lng": CENTER[1] + .25,
+            "center_lat": CENTER[0], "center_lng": CENTER[1], "zoom": 14}
+    encodings = ["identity", "gzip"] + (["br"] if app.brotli is not None else [])
+    print(f"{'format':>9} {'encoding':>9} {'bytes':>10} {'ratio':>6} {'ms':>7}")
+    base = None
+    for fmt in ("json", "columnar"):
+        for enc in encodings:
+            body["center_lat"] += 0.02  # defeat the small-move debounce
+            url = "/refresh?format=columnar" if fmt == "columnar" else "/refresh"
+            t0 = time.perf_counter()
+            resp = client.post(url, json=body, headers={"Accept-Encoding": enc})
+            ms = (time.perf_counter() - t0) * 1000.0
+            base = base or len(resp.data)
+            print(f"{fmt:>9} {enc:>9} {len(resp.data):>10} {base / len(resp.data):>6.1f} {ms:>7.1f}")
+
+
+def bench_prefetch(app, pans, think, latency, interval):
+    """A user panning one viewport east every `think` seconds, with and without neighbor prefetch.
+
+    Every viewport is its own location, so without prefetch each pan pays a live
+    search; with it the pan lands on a location warmed during the think time.
+    """
+    start_stub_zillow(app, latency)
+    app.MIN_REFRESH_INTERVAL = 0
+    app.ZILLOW_MIN_INTERVAL = interval
+    h, w = VIEWPORT[2] - VIEWPORT[0], VIEWPORT[3] - VIEWPORT[1]
+    app.reverse_geocode = lambda lat, lon: f"tile-{int((lat - VIEWPORT[0]) // h)}-{int((lon - VIEWPORT[1]) // w)}"
+    print(f"{'prefetch':>8} {'pans':>5} {'p50_ms':>8} {'p95_ms':>8} {'upstream':>8} {'hit_rate':>8} {'fetched':>7}")
+    for row, enabled in ((0, False), (10, True)):  # separate rows, so the second run starts cold too
+        app.PREFETCH_ENABLED = enabled
+        _StubZillow.requests = 0
+        before = app._prefetch_summary()
+        client = app.app.test_client()
+        times = []
+        for i in range(pans):
+            lat = VIEWPORT[0] + (row + 0.5) * h
+            lon = VIEWPORT[1] + (i + 0.5) * w
+            body = {"sw_lat": lat - h / 2, "sw_lng": lon - w / 2, "ne_lat": lat + h / 2, "ne_lng": lon + w / 2,
+                    "center_lat": lat, "center_lng": lon, "zoom": 14}
+            t0 = time.perf_counter()
+            client.post("/refresh", json=body)
+            times.append((time.perf_counter() - t0) * 1000.0)
+            time.sleep(think)
+        st = app._prefetch_summary()
+        hits, misses = st["hits"] - before["hits"], st["misses"] - before["misses"]
+        rate = f"{hits / (hits + misses):.2f}" if hits + misses else "-"
+        print(f"{'on' if enabled else 'off':>8} {pans:>5} {statistics.median(times):>8.1f} {_pct(times, .95):>8.1f} "
+              f"{_StubZillow.requests:>8} {rate:>8} {st['fetched'] - before['fetched']:>7}")
+
+
+def _legacy_comps(app, address, price, lat, lon):
+    # the pre-memo comps stage: one fetch_homes + sort per radius step
+    subject_price = app._price_num(price)
+    comps = []
+    for r in app.COMPS_RADIUS_STEPS:
+        props = app.fetch_homes(app.get_zip_or_city(address), lat - r, lon - r, lat + r, lon + r)
+        comps = sorted((h for h in props if h['address'] != address and h['price'] != 'No price'),
+                       key=lambda h: abs(app._price_num(h['price']) - subject_price))
+        if len(comps) >= app.COMPS_MIN:
+            break
+    return comps[:app.COMPS_MAX]
+
+
+def bench_comps(app, cached, subjects, latency):
+    """Comps lookup for /clicked, without the LLM call: a fetch per radius step vs. _find_comps cold and memoized.
+
+    Subjects are random points in a cache of `cached` homes; the location search
+    goes to the stub server once and is then served from props_by_location.
+    """
+    start_stub_zillow(app, latency)
+    _seed_properties(app, cached)
+    rnd = random.Random(11)
+    points = [(CENTER[0] + rnd.uniform(-0.5, 0.5), CENTER[1] + rnd.uniform(-0.5, 0.5)) for _ in range(subjects)]
+    args = [(f"{i} Subject Ave, Tampa, FL 33602", rnd.randint(200_000, 600_000), lat, lon) for i, (lat, lon) in enumerate(points)]
+    app._location_homes("33602")  # warm the one location every subject shares
+    legacy, cold, warm, mismatched = [], [], [], 0
+    app._cache["comps_by_subject"].clear()
+    for a in args:
+        old, t = _timed(lambda: _legacy_comps(app, *a), 1)
+        legacy += t
+        new, t = _timed(lambda: app._find_comps(*a), 1)
+        cold += t
+        _, t = _timed(lambda: app._find_comps(*a), 1)
+        warm += t
+        mismatched += [h["id"] for h in old] != [h["id"] for h in new]
+    print(f"{'mode':>8} {'subjects':>8} {'p50_ms':>8} {'p95_ms':>8}")
+    for name, samples in (("legacy", legacy), ("cold", cold), ("memo", warm)):
+        print(f"{name:>8} {subjects:>8} {statistics.median(samples):>8.2f} {_pct(samples, .95):>8.2f}")
+    print(f"result mismatches vs legacy: {mismatched}")
+
+
+def bench_lookup(app, cached, queries):
+    """/lookup address resolution from the local address index (no upstream calls).
+
+    Queries are addresses of cached homes written the way users type them: exact,
+    with the suffix spelled out and no ZIP, with a one-letter typo, or naming a
+    unit. Each picked home also has near-miss neighbours cached (a directional
+    variant and an "Apt 5" unit), and the negative queries -- another street, the
+    other directional, another unit, another city, an unknown number -- must come
+    back unmatched rather than as a neighbour.
+    """
+    _seed_properties(app, cached)
+    rnd = random.Random(5)
+    picks = rnd.sample(range(cached), min(queries, cached))
+    bucket = app._cache["property_by_zpid"]
+    bucket.max_entries = max(bucket.max_entries, cached + 2 * len(picks))
+    now = app._now()
+    for i in picks:
+        for base, addr in ((20_000_000, f"{i} N Bench St, Tampa, FL 33602"), (30_000_000, f"{i} Bench St Apt 5, Tampa, FL 33602")):
+            p = dict(_fake_payload(i, rnd), zpid=str(base + i), address=addr)
+            bucket.set(p["zpid"], {"ts": now, "listing": app.Listing.from_payload(p["zpid"], p)})
+    app._grid_rebuild()
+
+    cases = {
+        "exact": (lambda i: f"{i} Bench St, Tampa, FL 33602", lambda i: str(10_000_000 + i)),
+        "spelled_no_zip": (lambda i: f"{i} Bench Street, Tampa FL", lambda i: str(10_000_000 + i)),
+        "typo": (lambda i: f"{i} Bnech St, Tampa, FL 33602", lambda i: str(10_000_000 + i)),
+        "unit": (lambda i: f"{i} Bench Street Apartment 5 Tampa FL", lambda i: str(30_000_000 + i)),
+        "other_street": (lambda i: f"{i} Oak St, Tampa, FL 33602", lambda i: None),
+        "other_dir": (lambda i: f"{i} S Bench St, Tampa, FL 33602", lambda i: None),
+        "other_unit": (lambda i: f"{i} Bench St Apt 4, Tampa, FL 33602", lambda i: None),
+        "other_city": (lambda i: f"{i} Bench St, Orlando, FL", lambda i: None),
+        "unknown": (lambda i: f"{i + cached * 10} Bench St, Tampa, FL 33602", lambda i: None),
+    }
+    print(f"{'query':>15} {'n':>5} {'p50_us':>8} {'p95_us':>8} {'correct':>8}")
+    for kind, (make, expect) in cases.items():
+        times, correct = [], 0
+        for i in picks:
+            q = make(i)
+            zpid, t = _timed(lambda: app._addr_index_match(q), 1)
+            times.append(t[0] * 1000.0)
+            correct += zpid == expect(i)
+        print(f"{kind:>15} {len(picks):>5} {statistics.median(times):>8.1f} {_pct(times, .95):>8.1f} {correct:>8}")
+
+
+def _clicked_until_final(client, body):
+    """POST /clicked and follow a queued job to its end: (status code, final status, html delivered)."""
+    r = client.post("/clicked", json=body)
+    view = r.get_json() or {}
+    while r.status_code == 202 and view.get("status") not in ("done", "failed"):
+        time.sleep(0.02)
+        view = client.get(f"/clicked/jobs/{view['job_id']}").get_json()
+    return r.status_code, view.get("status"), bool(view.get("html"))
+
+
+def bench_quota(app, rounds, gen_s=0.2):
+    """Quota admission for /clicked: two simultaneous clicks on different reports at quota 1.
+
+    Report generation is stubbed to sleep gen_s. Every round must end with exactly one
+    delivered report, one 403 and one charge; a job whose final charge is denied (quota
+    lowered while it ran) must fail without its report. Exits non-zero on a violation.
+    """
+    app._generate_report = lambda data, address, price, language, on_delta=None: (time.sleep(gen_s), f"<p>{address}</p>")[1]
+    failures = []
+    for rnd in range(rounds):
+        user = f"quota-bench-{rnd}"
+        app._user_write_quota(user, 1, 1)
+        barrier = threading.Barrier(2)
+        results = []
+
+        def click(i):
+            client = app.app.test_client()
+            with client.session_transaction() as sess:
+                sess["user"] = user
+            barrier.wait()
+            results.append(_clicked_until_final(client, {"address": f"{rnd * 10 + i} Quota St, Tampa, FL 33602",
+                                                         "price": 1, "zpid": f"q{rnd}-{i}"}))
+
+        threads = [threading.Thread(target=click, args=(i,)) for i in range(2)]
+        [t.start() for t in threads]; [t.join() for t in threads]
+        delivered = sum(1 for _code, status, html in results if status == "done" and html)
+        refused = sum(1 for code, _status, _html in results if code == 403)
+        if delivered != 1 or refused != 1 or app._user_read_quota(user)[0] != 0:
+            failures.append((rnd, sorted(results)))
+
+    user = "quota-bench-lowered"
+    app._user_write_quota(user, 1, 1)
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = user
+    threading.Timer(gen_s / 2, lambda: app._user_write_quota(user, 0, 1)).start()
+    lowered = _clicked_until_final(client, {"address": "1 Lowered St, Tampa, FL 33602", "price": 1, "zpid": "q-lowered"})
+
+    print(f"{'rounds':>6} {'violations':>10}  lowered-mid-job")
+    print(f"{rounds:>6} {len(failures):>10}  {lowered}")
+    for rnd, results in failures:
+        print(f"round {rnd}: {results}")
+    if failures or lowered != (202, "failed", False):
+        sys.exit(1)
+
+
+_STARTUP_PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import map as app
+t_import = time.perf_counter() - t0
+app.app.test_client().get("/debug/ping")
+t_first = time.perf_counter() - t0
+app._prop_hydrated.wait()
+t_hydrated = time.perf_counter() - t0
+t1 = time.perf_counter()
+app._openai()
+print(json.dumps({"import": t_import, "first": t_first, "hydrated": t_hydrated,
+                  "loaded": app._prop_hydrate_stats["loaded"], "openai": time.perf_counter() - t1}))
+"""
+
+
+def bench_startup(app, sizes, runs):
+    """Fresh-process import-to-first-response time against the size of the property store.
+
+    Each size gets its own scratch directory with a property_cache.db of that many
+    rows; the probe imports map.py there, answers /debug/ping, then waits for the
+    background hydration to finish. "openai" is the deferred client build, paid by
+    the first report instead of at startup.
+    """
+    rnd = random.Random(3)
+    now = app._now()
+    print(f"{'rows':>7} {'import_s':>9} {'first_resp_s':>12} {'hydrated_s':>10} {'loaded':>7} {'openai_s':>8}")
+    for n in sizes:
+        work = tempfile.mkdtemp(prefix="reintel-startup-")
+        db = app.PROPERTY_DB_FILE
+        try:
+            app.PROPERTY_DB_FILE = app.pathlib.Path(work) / "property_cache.db"
+            conn = app._prop_db_open()
+            with conn:
+                rows = []
+                for i in range(n):
+                    p = _fake_payload(i, rnd)
+                    rows.append(app._store_row(p["zpid"], now, app.Listing.from_payload(p["zpid"], p), p))
+                conn.executemany("INSERT OR REPLACE INTO property_by_zpid (zpid, ts, payload, listing) VALUES (?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(now),))
+            conn.close()
+        finally:
+            app.PROPERTY_DB_FILE = db
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE, ROOT], cwd=work, capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        med = {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+        print(f"{n:>7} {med['import']:>9.2f} {med['first']:>12.2f} {med['hydrated']:>10.2f} {int(med['loaded']):>7} {med['openai']:>8.2f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("spatial", help="cache-first viewport query latency vs. cache size")
+    sp.add_argument("--sizes", default="1000,10000,100000")
+    sp.add_argument("--repeat", type=int, default=50)
+    zp = sub.add_parser("zillow", help="/refresh throughput and p95 against a local stub Zillow server")
+    zp.add_argument("--clients", type=int, default=8)
+    zp.add_argument("--requests", type=int, default=25, help="refreshes per client")
+    zp.add_argument("--interval", type=float, default=0.005, help="ZILLOW_MIN_INTERVAL for the run")
+    zp.add_argument("--latency", type=float, default=0.0, help="stub server think time (s)")
+    zp.add_argument("--pools", default="0,4", help="ZILLOW_POOL_SIZE values to compare")
+    lp = sub.add_parser("listings", help="card building cost and memory: raw payloads vs. normalized listings")
+    lp.add_argument("--count", type=int, default=20000)
+    lp.add_argument("--repeat", type=int, default=10)
+    tp = sub.add_parser("ttfm", help="/refresh time to first marker: buffered JSON vs. NDJSON streaming")
+    tp.add_argument("--runs", type=int, default=10)
+    tp.add_argument("--latency", type=float, default=0.3, help="stub server think time (s)")
+    tp.add_argument("--cached", type=int, default=10000, help="properties already in the cache")
+    cp = sub.add_parser("clusters", help="low-zoom /refresh size and latency: homes vs. clusters")
+    cp.add_argument("--cached", type=int, default=100000)
+    cp.add_argument("--zoom", type=int, default=10)
+    cp.add_argument("--repeat", type=int, default=10)
+    dp = sub.add_parser("delta", help="bytes, latency and markers touched per pan: full arrays vs. the delta protocol")
+    dp.add_argument("--cached", type=int, default=100000)
+    dp.add_argument("--pans", type=int, default=40)
+    dp.add_argument("--step", type=float, default=0.1, help="pan distance as a fraction of the viewport")
+    wp = sub.add_parser("wire", help="/refresh response size: JSON vs. columnar, with and without compression")
+    wp.add_argument("--cached", type=int, default=20000)
+    pp = sub.add_parser("prefetch", help="per-pan /refresh latency and hit rate with and without neighbor prefetch")
+    pp.add_argument("--pans", type=int, default=12)
+    pp.add_argument("--think", type=float, default=2.0, help="seconds between pans")
+    pp.add_argument("--latency", type=float, default=0.3, help="stub server think time (s)")
+    pp.add_argument("--interval", type=float, default=0.5, help="ZILLOW_MIN_INTERVAL for the run")
+    mp = sub.add_parser("comps", help="/clicked comps lookup latency: a fetch per radius step vs. _find_comps (cold, memoized)")
+    mp.add_argument("--cached", type=int, default=2000)
+    mp.add_argument("--subjects", type=int, default=50)
+    mp.add_argument("--latency", type=float, default=0.0, help="stub server think time (s)")
+    up = sub.add_parser("startup", help="import-to-first-response and hydration time vs. property store size")
+    up.add_argument("--sizes", default="0,10000,100000")
+    up.add_argument("--runs", type=int, default=3)
+    kp = sub.add_parser("lookup", help="/lookup address resolution latency and accuracy from the local address index")
+    kp.add_argument("--cached", type=int, default=100000)
+    kp.add_argument("--queries", type=int, default=500)
+    qp = sub.add_parser("quota", help="/clicked quota admission under concurrent clicks (fails on overspend)")
+    qp.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    app = load_app()
+    if args.cmd == "spatial":
+        bench_spatial(app, [int(x) for x in args.sizes.split(",") if x], args.repeat)
+    elif args.cmd == "zillow":
+        bench_zillow(app, args.clients, args.requests, args.interval, args.latency,
+                     [int(x) for x in args.pools.split(",") if x])
+    elif args.cmd == "listings":
+        bench_listings(app, args.count, args.repeat)
+    elif args.cmd == "ttfm":
+        bench_ttfm(app, args.runs, args.latency, args.cached)
+    elif args.cmd == "clusters":
+        bench_clusters(app, args.cached, args.zoom, args.repeat)
+    elif args.cmd == "delta":
+        bench_delta(app, args.cached, args.pans, args.step)
+    elif args.cmd == "wire":
+        bench_wire(app, args.cached)
+    elif args.cmd == "prefetch":
+        bench_prefetch(app, args.pans, args.think, args.latency, args.interval)
+    elif args.cmd == "comps":
+        bench_comps(app, args.cached, args.subjects, args.latency)
+    elif args.cmd == "lookup":
+        bench_lookup(app, args.cached, args.queries)
+    elif args.cmd == "quota":
+        bench_quota(app, args.rounds)
+    elif args.cmd == "startup":
+        bench_startup(app, [int(x) for x in args.sizes.split(",") if x], args.runs)
+
+
+if __name__ == "__main__":
+    main()